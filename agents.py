@@ -1,30 +1,190 @@
+import contextlib
+import contextvars
+import functools
+import hashlib
+import importlib.util
+import json
+import logging
 import os
+import re
+import sys
+import threading
 import time
-from typing import Type
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Type
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from crewai import Agent, Task, Crew, Process, LLM
 from crewai.tools import BaseTool
+from cache import SemanticCache, SEMANTIC_CACHE_AVAILABLE
+from rate_limit import TokenBucket, backoff_delay, is_rate_limit_error
 
 # Load environment variables (for non-LinkUp settings)
 load_dotenv()
 
-# Try to import LinkupClient with error handling
-try:
-    from linkup import LinkupClient
+# CrewAI verbose output is thousands of lines per run, so it is opt-in via CREW_VERBOSE=1
+# and, when on, kept in a bounded in-memory buffer per research session instead of stdout
+VERBOSE = os.getenv("CREW_VERBOSE") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+class ResearchLog:
+    """Bounded buffer of the log records and printed output of one research session"""
+
+    def __init__(self, maxlen: int = 2000):
+        self.records = deque(maxlen=maxlen)
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def add(self, line: str):
+        self.records.append(line)
+
+    def write(self, text: str):
+        """Append printed text, one record per complete non-blank line"""
+        with self._lock:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+            self.records.extend(line for line in lines if line.strip())
+        return len(text)
+
+    def tail(self, lines: int = 200):
+        """Return the most recent lines, oldest first"""
+        return "\n".join(list(self.records)[-lines:])
+
+
+# The log of the research session running in the current context. Crews run in copies of
+# the context that started them, so their output lands in their own session's log only.
+_research_log: contextvars.ContextVar[Optional[ResearchLog]] = contextvars.ContextVar("research_log",
+                                                                                      default=None)
+
+
+class _ResearchLogHandler(logging.Handler):
+    """Logging handler that appends records to the log of the research session they come from"""
+
+    def emit(self, record):
+        research_log = _research_log.get()
+        if research_log is None:
+            return
+        try:
+            research_log.add(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_log_handler = _ResearchLogHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+for _logger_name in ("crewai", __name__):
+    logging.getLogger(_logger_name).addHandler(_log_handler)
+logging.getLogger("crewai").setLevel(logging.DEBUG if VERBOSE else logging.WARNING)
+logger.setLevel(logging.INFO)
+
+
+class _ResearchStdout:
+    """stdout wrapper that sends text printed inside a research session to that session's log.
+
+    CrewAI's verbose trace is printed (Printer / rich console), not logged. Output from any
+    other context, thread or user goes straight to the wrapped stream, and everything else
+    (fileno, encoding, buffer, ...) is delegated to it.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        research_log = _research_log.get()
+        if research_log is None:
+            return self._stream.write(text)
+        return research_log.write(text)
+
+    def flush(self):
+        if _research_log.get() is None:
+            self._stream.flush()
+
+    def isatty(self):
+        # Keep rich from writing terminal escape codes into the log
+        return _research_log.get() is None and self._stream.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_stdout_install_lock = threading.Lock()
 
-    LINKUP_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: LinkupClient import failed: {e}")
+
+@contextlib.contextmanager
+def capture_crew_output(research_log: ResearchLog):
+    """Send log records and printed output from this context to ``research_log`` instead of stdout"""
+    with _stdout_install_lock:
+        if not isinstance(sys.stdout, _ResearchStdout):
+            sys.stdout = _ResearchStdout(sys.stdout)
+    token = _research_log.set(research_log)
+    try:
+        yield
+    finally:
+        _research_log.reset(token)
+
+
+def get_log_tail(research_log: Optional[ResearchLog] = None, lines: int = 200):
+    """Return the most recent lines of a research session's log, by default the current one"""
+    research_log = research_log or _research_log.get()
+    if research_log is None:
+        return ""
+    return research_log.tail(lines)
+
+
+# Check for LinkupClient without importing it - the SDK is only loaded once a search runs
+LINKUP_AVAILABLE = importlib.util.find_spec("linkup") is not None
+if not LINKUP_AVAILABLE:
+    print("Warning: LinkupClient is not available: linkup-sdk is not installed")
     print("Please install linkup-sdk: pip install linkup-sdk")
-    LINKUP_AVAILABLE = False
+
+# Try to import diskcache for the persistent LinkUp result cache
+try:
+    import diskcache
+
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+# Semantic cache of finished reports, so repeated or paraphrased queries skip the crew entirely
+_semantic_cache = SemanticCache(max_entries=500) if SEMANTIC_CACHE_AVAILABLE else None
+_cache_threshold = 0.92
+_cache_ttl = 24 * 3600
+
+
+# Compact spec for the writer - section word budgets keep Gemini's output (and cost) bounded
+REPORT_END_MARKER = "\n---END---"
+REPORT_SCHEMA = json.dumps({
+    "format": "markdown",
+    "target_words": "1500-2000",
+    "sections": [
+        {"name": "Executive Summary", "max_words": 200},
+        {"name": "Introduction and Background", "max_words": 350},
+        {"name": "Key Findings and Analysis", "max_words": 750},
+        {"name": "Current Trends and Developments", "max_words": 350},
+        {"name": "Conclusion and Implications", "max_words": 250},
+    ],
+})
 
 
 def get_llm_client():
-    """Initialize and return the Gemini LLM client with enhanced settings for longer content"""
+    """Return the Gemini LLM client for the current API key, reusing it across research sessions"""
+    return _get_llm_client(os.getenv("GEMINI_API_KEY"))
+
+
+def get_writer_llm_client():
+    """Return the Gemini LLM client used by the report writer"""
+    return _get_writer_llm_client(os.getenv("GEMINI_API_KEY"))
+
+
+@functools.lru_cache(maxsize=4)
+def _get_llm_client(api_key):
+    """Initialize the Gemini LLM client with enhanced settings for longer content"""
     return LLM(
         model="gemini/gemini-2.5-pro",
-        api_key=os.getenv("GEMINI_API_KEY"),
+        api_key=api_key,
         temperature=0.4,  # Slightly higher for more varied content
         max_tokens=4000,  # Increased from 1500 to allow longer responses
         request_timeout=120,  # Increased timeout for longer processing
@@ -32,6 +192,23 @@ def get_llm_client():
     )
 
 
+@functools.lru_cache(maxsize=4)
+def _get_writer_llm_client(api_key):
+    """Initialize the writer's own Gemini LLM client, which stops at the report end marker"""
+    return LLM(
+        model="gemini/gemini-2.5-pro",
+        api_key=api_key,
+        temperature=0.4,  # Slightly higher for more varied content
+        # Gemini 2.5 counts thinking tokens against the output limit, so on top of the
+        # ~2600-token report and CrewAI's Thought/Final Answer wrapper this leaves headroom;
+        # report length itself is bounded by the section spec and the stop marker
+        max_tokens=8192,
+        stop=[REPORT_END_MARKER],  # The writer ends its report with this marker
+        request_timeout=120,  # Increased timeout for longer processing
+        max_retries=3,
+    )
+
+
 # Define LinkUp Search Tool with enhanced result handling
 class LinkUpSearchInput(BaseModel):
     """Input schema for LinkUp Search Tool."""
@@ -42,28 +219,170 @@ class LinkUpSearchInput(BaseModel):
         default="searchResults", description="Output type: 'searchResults', 'sourcedAnswer', or 'structured'")
 
 
-# Global search counter - increased limit for more comprehensive research
-_global_search_count = 0
+# Search budget per research session - increased limit for more comprehensive research
 _max_searches = 5  # Increased from 3 to 5 for more thorough research
+_QUERY_NORMALIZE = re.compile(r'[\W_]+')
+
+
+class SearchSession:
+    """Search budget and result cache shared by the searches of one research session.
+
+    The cache is keyed on the normalized query, so agent retries that re-issue
+    the same search don't spend another slot.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.cache = {}
+        self.lock = threading.Lock()
+
+
+# The current research session, scoped per thread/task so concurrent users don't share a
+# budget. Each LinkUpSearchTool binds the session current when it is created, since CrewAI
+# may run tools on its own worker threads; the ContextVar is only the default for that
+# lookup, and the fallback covers code outside any research session.
+_search_session: contextvars.ContextVar[Optional[SearchSession]] = contextvars.ContextVar("search_session",
+                                                                                   default=None)
+_fallback_search_session = SearchSession()
+
+
+def _current_search_session(session=None):
+    return session or _search_session.get() or _fallback_search_session
+
+
+# LinkUp results persisted across sessions - the same topics get researched repeatedly
+# Cache errors (unwritable directory, SQLite failures) only disable caching, never searching
+_linkup_cache_ttl = 24 * 3600
+
+
+def _open_linkup_cache():
+    if not DISKCACHE_AVAILABLE:
+        return None
+    cache_dir = os.getenv("LINKUP_CACHE_DIR", ".linkup_cache")
+    try:
+        return diskcache.Cache(cache_dir, size_limit=500_000_000)
+    except Exception as e:
+        logger.warning(f"Could not open LinkUp cache in {cache_dir}: {e}")
+        return None
+
+
+_linkup_cache = _open_linkup_cache()
+
+
+def get_disk_cached_search(key):
+    """Get a search response persisted by an earlier session, or None"""
+    if _linkup_cache is None:
+        return None
+    try:
+        return _linkup_cache.get(key)
+    except Exception as e:
+        logger.warning(f"LinkUp cache read failed: {e}")
+        return None
+
+
+def disk_cache_search(key, response: str):
+    """Persist a search response for later sessions"""
+    if _linkup_cache is None:
+        return
+    try:
+        _linkup_cache.set(key, response, expire=_linkup_cache_ttl)
+    except Exception as e:
+        logger.warning(f"LinkUp cache write failed: {e}")
+
+
+# Shared LinkUp rate limiter - blocks only when the per-second budget is actually used up
+_linkup_bucket = TokenBucket(rate=2.0, capacity=5)
+_max_rate_limit_retries = 3
 
 
 def reset_search_counter():
-    """Reset the global search counter for a new research session"""
-    global _global_search_count
-    _global_search_count = 0
+    """Start a fresh search budget and cache for a new research session in the current context"""
+    global _fallback_search_session
+    _fallback_search_session = SearchSession()
+    _search_session.set(SearchSession())
 
 
-def increment_search_counter():
+def increment_search_counter(session=None):
     """Increment and return the current search count"""
-    global _global_search_count
-    _global_search_count += 1
-    return _global_search_count
+    session = _current_search_session(session)
+    with session.lock:
+        session.count += 1
+        return session.count
+
+
+def reserve_search_slot(session=None):
+    """Atomically claim a search slot, returning the new count or None if the limit is reached"""
+    session = _current_search_session(session)
+    with session.lock:
+        if session.count >= _max_searches:
+            return None
+        session.count += 1
+        return session.count
+
+
+def release_search_slot(session=None):
+    """Give back a slot claimed by a search that failed"""
+    session = _current_search_session(session)
+    with session.lock:
+        session.count = max(0, session.count - 1)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse punctuation and whitespace into single spaces"""
+    return _QUERY_NORMALIZE.sub(" ", query.lower()).strip()
+
+
+def get_cached_search(key, session=None):
+    """Get a search response cached earlier in this session, or None"""
+    session = _current_search_session(session)
+    with session.lock:
+        return session.cache.get(key)
 
 
-def get_search_count():
+def cache_search(key, response: str, session=None):
+    """Cache a search response for the rest of this session"""
+    session = _current_search_session(session)
+    with session.lock:
+        session.cache[key] = response
+
+
+def get_search_count(session=None):
     """Get the current search count"""
-    global _global_search_count
-    return _global_search_count
+    session = _current_search_session(session)
+    with session.lock:
+        return session.count
+
+
+# Search result formatting limits - whole results only, so the writer never sees a cut-off record
+_max_results = 10
+_max_result_chars = 4000
+_snippet_chars = 400
+
+
+def format_search_results(search_response):
+    """Format LinkUp search results as a compact markdown list of title, URL and snippet.
+
+    Results are appended whole until the character budget is reached, so the
+    output never ends mid-result.
+    """
+    blocks = []
+    total = 0
+    for result in search_response.results[:_max_results]:
+        content = getattr(result, "content", "")  # Image results have no text content
+        block = f"### {result.name}\n{result.url}\n{content[:_snippet_chars]}".rstrip()
+        if blocks and total + len(block) > _max_result_chars:
+            break
+        blocks.append(block)
+        total += len(block) + 2
+    return "\n\n".join(blocks) if blocks else "No results found."
+
+
+@functools.lru_cache(maxsize=4)
+def _get_linkup_client(api_key):
+    """Return a LinkupClient for the API key, shared by every search made with that key"""
+    from linkup import LinkupClient
+
+    return LinkupClient(api_key=api_key)
 
 
 class LinkUpSearchTool(BaseTool):
@@ -71,8 +390,11 @@ class LinkUpSearchTool(BaseTool):
     description: str = "Search the web for information using LinkUp and return comprehensive results (max 5 searches per session)"
     args_schema: Type[BaseModel] = LinkUpSearchInput
 
-    def __init__(self):
+    _session: Optional[SearchSession] = PrivateAttr(default=None)
+
+    def __init__(self, session: Optional[SearchSession] = None):
         super().__init__()
+        self._session = _current_search_session(session)
         if not LINKUP_AVAILABLE:
             raise ImportError("LinkupClient is not available. Please install linkup-sdk: pip install linkup-sdk")
 
@@ -81,49 +403,172 @@ class LinkUpSearchTool(BaseTool):
         if not LINKUP_AVAILABLE:
             return "Error: LinkupClient is not available. Please install linkup-sdk: pip install linkup-sdk"
 
-        # Enforce search limit using global counter
-        current_count = get_search_count()
-        if current_count >= _max_searches:
+        # Repeated searches in this session are answered from the cache without using a slot
+        cache_key = (normalize_query(query), depth, output_type)
+        cached = get_cached_search(cache_key, self._session)
+        if cached is not None:
+            return cached
+
+        disk_key = hashlib.sha256("|".join(cache_key).encode()).hexdigest()
+        cached = get_disk_cached_search(disk_key)
+        if cached is not None:
+            cached = f"Cached search result:\n{cached}"
+            cache_search(cache_key, cached, self._session)
+            return cached
+
+        # Enforce search limit by claiming a slot up front, so parallel searches can't overshoot it
+        new_count = reserve_search_slot(self._session)
+        if new_count is None:
             return f"Maximum search limit ({_max_searches}) reached. Please analyze existing results."
 
         try:
             # Check if API key is available
             api_key = os.getenv("LINKUP_API_KEY")
             if not api_key:
+                release_search_slot(self._session)
                 return "Error: LINKUP_API_KEY environment variable not set"
 
-            # Initialize LinkUp client with API key from environment variables
-            linkup_client = LinkupClient(api_key=api_key)
-
-            # Add delay to prevent rate limiting
-            time.sleep(1.5)
+            # Reuse the LinkUp client for the API key from environment variables
+            linkup_client = _get_linkup_client(api_key)
 
             # Perform search - use deep search for every 3rd query for more comprehensive results
-            search_depth = "deep" if (current_count + 1) % 3 == 0 else "standard"
-
-            search_response = linkup_client.search(
-                query=query,
-                depth=search_depth,
-                output_type=output_type
-            )
-
-            # Increment counter and get new count
-            new_count = increment_search_counter()
+            search_depth = "deep" if new_count % 3 == 0 else "standard"
+
+            for attempt in range(_max_rate_limit_retries + 1):
+                _linkup_bucket.acquire()
+                try:
+                    search_response = linkup_client.search(
+                        query=query,
+                        depth=search_depth,
+                        output_type=output_type
+                    )
+                    break
+                except Exception as e:
+                    # Back off exponentially on rate limit responses, give up on anything else
+                    if not is_rate_limit_error(e) or attempt == _max_rate_limit_retries:
+                        raise
+                    time.sleep(backoff_delay(attempt))
 
             # Enhanced result handling - keep more content but still prevent overflow
-            response_str = str(search_response)
-            if len(response_str) > 4000:  # Increased from 2000 to 4000 for more content
+            if output_type == "searchResults":
+                response_str = format_search_results(search_response)
+            else:
+                response_str = str(search_response)
+            if len(response_str) > _max_result_chars:  # Increased from 2000 to 4000 for more content
                 response_str = response_str[
-                               :4000] + f"\n... [Results truncated at 4000 chars for efficiency, search {new_count} using {search_depth} depth]"
+                               :_max_result_chars] + f"\n... [Results truncated at {_max_result_chars} chars for efficiency, search {new_count} using {search_depth} depth]"
 
-            return f"Search {new_count}/{_max_searches} ({search_depth} depth):\n{response_str}"
+            disk_cache_search(disk_key, response_str)
+
+            response_str = f"Search {new_count}/{_max_searches} ({search_depth} depth):\n{response_str}"
+            cache_search(cache_key, response_str, self._session)
+            return response_str
 
         except Exception as e:
+            release_search_slot(self._session)
             return f"Error occurred while searching: {str(e)}"
 
 
-def create_research_crew(query: str):
-    """Create and configure the research crew for comprehensive 2-3 page reports"""
+# The strategic angles researched in parallel, one search agent per angle
+SEARCH_ANGLES = [
+    ("overview", "Main topic overview and background"),
+    ("stats", "Current statistics, data, and trends"),
+    ("news", "Recent developments and news"),
+    ("experts", "Expert opinions and analysis"),
+    ("implications", "Detailed aspects and implications"),
+]
+TOTAL_TASKS = len(SEARCH_ANGLES) + 1  # One search task per angle plus the writer task
+# Search crews running at once - each one is a Gemini agent, so this also caps concurrent LLM calls
+_max_parallel_search_crews = 3
+
+
+class ResearchCrew:
+    """Fan out the per-angle search crews in parallel, then fan in to the writer crew.
+
+    A search crew that fails is logged and skipped, so one rate-limited or timed-out
+    angle doesn't throw away the others. The run only fails, and gets retried by
+    run_research, when every angle failed.
+    """
+
+    def __init__(self, search_crews, writer_crew):
+        self.search_crews = search_crews
+        self.writer_crew = writer_crew
+
+    def kickoff(self):
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(_max_parallel_search_crews, len(self.search_crews))) as executor:
+            # Each worker runs in its own copy of this context, so all of them share the session
+            futures = [executor.submit(contextvars.copy_context().run, crew.kickoff)
+                       for crew in self.search_crews]
+            for i, future in enumerate(futures, 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Search crew {i}/{len(futures)} failed, continuing without it: {e}")
+                    errors.append(e)
+
+        if errors and len(errors) == len(futures):
+            raise errors[0]
+
+        # The writer task reads the finished search tasks through its context; CrewAI skips
+        # context tasks without output, so failed angles just drop out of the report's sources
+        return self.writer_crew.kickoff()
+
+
+def create_search_crews(query: str, linkup_search_tool, client, step_callback=None, task_callback=None):
+    """Create one single-task crew per search angle so the searches can run concurrently"""
+    search_crews = []
+    for angle, focus in SEARCH_ANGLES:
+        web_searcher = Agent(
+            role=f"Web Researcher ({angle})",
+            goal=f"Gather authoritative information on one angle of the topic: {focus.lower()}.",
+            backstory="You are an expert researcher who runs precise, targeted searches and reports the key facts, figures and sources you find.",
+            verbose=VERBOSE,
+            allow_delegation=False,
+            tools=[linkup_search_tool],
+            llm=client,
+            max_execution_time=300,  # Increased from 180 to 300 seconds
+            max_iter=3,  # Increased iterations for thoroughness
+        )
+
+        search_task = Task(
+            description=f"""
+            Research the following topic: {query}
+
+            Focus: {focus}
+
+            Perform ONE specific, targeted search for this focus:
+            - Focus on authoritative sources
+            - Gather both quantitative and qualitative data
+            - Note publication dates and source credibility
+            - Collect supporting evidence and examples
+            """,
+            agent=web_searcher,
+            expected_output=f"Search results covering {focus.lower()} with detailed information and credible sources.",
+            tools=[linkup_search_tool],
+            max_execution_time=300
+        )
+
+        search_crews.append(Crew(
+            agents=[web_searcher],
+            tasks=[search_task],
+            verbose=VERBOSE,
+            process=Process.sequential,
+            max_execution_time=300,
+            memory=False,
+            step_callback=step_callback,
+            task_callback=task_callback,
+        ))
+
+    return search_crews
+
+
+def create_research_crew(query: str, step_callback=None, task_callback=None):
+    """Create and configure the research crew for comprehensive 2-3 page reports.
+
+    step_callback and task_callback are handed to every crew, so callers can
+    follow agent steps and finished tasks while the research runs.
+    """
 
     # Check if LinkUp is available
     if not LINKUP_AVAILABLE:
@@ -142,109 +587,82 @@ def create_research_crew(query: str):
     # Get LLM client
     client = get_llm_client()
 
-    # Enhanced web searcher agent for comprehensive research
-    web_searcher = Agent(
-        role="Comprehensive Web Researcher",
-        goal="Conduct thorough research using 5 strategic searches to gather comprehensive information.",
-        backstory="You are an expert researcher who conducts systematic, multi-angle investigations. You search for overview, details, recent developments, statistics, and expert opinions to build a complete picture.",
-        verbose=True,  # Enabled for better tracking
-        allow_delegation=False,
-        tools=[linkup_search_tool],
-        llm=client,
-        max_execution_time=300,  # Increased from 180 to 300 seconds
-        max_iter=3,  # Increased iterations for thoroughness
-    )
+    # Parallel search crews, one per strategic angle
+    search_crews = create_search_crews(query, linkup_search_tool, client, step_callback, task_callback)
+    search_tasks = [task for search_crew in search_crews for task in search_crew.tasks]
 
     # Enhanced research analyst and writer for longer content
     research_writer = Agent(
         role="Comprehensive Research Writer",
         goal="Create detailed, well-structured research reports of 2-3 pages from search results.",
         backstory="You are a skilled research writer who creates comprehensive, well-organized reports. You excel at synthesizing multiple sources into coherent, detailed analyses with proper structure and citations.",
-        verbose=True,  # Enabled for better tracking
+        verbose=VERBOSE,
         allow_delegation=False,
         tools=[],
-        llm=client,
+        llm=get_writer_llm_client(),
         max_execution_time=240,  # Increased from 120 to 240 seconds
         max_iter=2,  # Allow for revision
     )
 
-    # Enhanced search task for comprehensive research
-    search_task = Task(
-        description=f"""
-        Conduct comprehensive research about: {query}
-
-        Execute 5 strategic searches covering:
-        1. Main topic overview and background
-        2. Current statistics, data, and trends
-        3. Recent developments and news
-        4. Expert opinions and analysis
-        5. Detailed aspects and implications
-
-        For each search:
-        - Use specific, targeted queries
-        - Focus on authoritative sources
-        - Gather both quantitative and qualitative data
-        - Note publication dates and source credibility
-        - Collect supporting evidence and examples
-
-        Ensure comprehensive coverage of the topic from multiple angles.
-        """,
-        agent=web_searcher,
-        expected_output="Comprehensive search results from 5 strategic searches covering different aspects of the topic with detailed information and credible sources.",
-        tools=[linkup_search_tool],
-        max_execution_time=300
-    )
-
     # Enhanced analysis task for detailed report
     analysis_writing_task = Task(
         description=f"""
-        Create a comprehensive research report about: {query}
-
-        Requirements:
-        - Target length: 1500-2000 words (2-3 pages)
-        - Use ALL provided search results effectively
-        - Create a well-structured report with clear sections:
-          * Executive Summary (150-200 words)
-          * Introduction and Background (300-400 words)
-          * Key Findings and Analysis (600-800 words)
-          * Current Trends and Developments (300-400 words)
-          * Conclusion and Implications (200-300 words)
-
-        Content guidelines:
-        - Include specific data, statistics, and examples
-        - Cite sources appropriately throughout
-        - Provide balanced analysis with multiple perspectives
-        - Use clear headings and subheadings
-        - Include relevant quotes from experts (if available)
-        - Maintain professional, informative tone
-        - Ensure logical flow between sections
-
-        Format as markdown with proper headings and formatting.
+        Write a research report about: {query}
+
+        Follow this spec exactly: {REPORT_SCHEMA}
+
+        - One markdown heading per section, in order, within its max_words
+        - Use the provided search results; include specific data, statistics and expert quotes
+        - Cite sources inline
+        - End the report with the line ---END--- and write nothing after it
         """,
         agent=research_writer,
         expected_output="A comprehensive 1500-2000 word research report with clear structure, detailed analysis, and proper citations.",
-        context=[search_task],
+        context=search_tasks,
         max_execution_time=240
     )
 
     # Create the crew with enhanced settings
-    crew = Crew(
-        agents=[web_searcher, research_writer],
-        tasks=[search_task, analysis_writing_task],
-        verbose=True,  # Enabled for better tracking
+    writer_crew = Crew(
+        agents=[research_writer],
+        tasks=[analysis_writing_task],
+        verbose=VERBOSE,
         process=Process.sequential,
         max_execution_time=600,  # Increased from 360 to 600 seconds (10 minutes)
         memory=False,
+        step_callback=step_callback,
+        task_callback=task_callback,
     )
 
-    return crew
+    return ResearchCrew(search_crews, writer_crew)
+
 
+def run_research(query: str, step_callback=None, task_callback=None, research_log: Optional[ResearchLog] = None,
+                 attempt_callback=None):
+    """Run the enhanced research process for comprehensive 2-3 page reports.
 
-def run_research(query: str):
-    """Run the enhanced research process for comprehensive 2-3 page reports"""
+    Log records and CrewAI's printed output from the run go to ``research_log``,
+    or to a throwaway log when none is given. attempt_callback is called with the
+    attempt number whenever a fresh set of crews starts, so callers following the
+    step and task callbacks can reset their progress on a retry.
+    """
+    with capture_crew_output(research_log or ResearchLog()):
+        return _run_research(query, step_callback, task_callback, attempt_callback)
+
+
+def _run_research(query: str, step_callback=None, task_callback=None, attempt_callback=None):
     max_retries = 3
     retry_delay = 3  # Increased delay for stability
 
+    # Serve near-duplicate queries from the semantic cache
+    if _semantic_cache is not None:
+        try:
+            hit = _semantic_cache.lookup(query, threshold=_cache_threshold, ttl=_cache_ttl)
+            if hit is not None:
+                return hit.report
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+
     for attempt in range(max_retries):
         try:
             # Reset search counter for new research session
@@ -254,14 +672,24 @@ def run_research(query: str):
             if attempt > 0:
                 time.sleep(retry_delay * attempt)
 
-            crew = create_research_crew(query)
+            crew = create_research_crew(query, step_callback, task_callback)
+            if attempt_callback is not None:
+                attempt_callback(attempt + 1)
             result = crew.kickoff()
+            # Drop the end marker in case the model emitted it instead of stopping on it
+            report = result.raw.split(REPORT_END_MARKER.strip())[0].rstrip()
 
             # Ensure we have substantial content
-            if len(result.raw) < 500:
-                return f"Research completed but content seems limited. Here's what was found:\n\n{result.raw}\n\n[Note: For more comprehensive results, try refining your query or checking API limits]"
+            if len(report) < 500:
+                return f"Research completed but content seems limited. Here's what was found:\n\n{report}\n\n[Note: For more comprehensive results, try refining your query or checking API limits]"
+
+            if _semantic_cache is not None:
+                try:
+                    _semantic_cache.insert(query, report, ttl=_cache_ttl)
+                except Exception as e:
+                    logger.warning(f"Semantic cache insert failed: {e}")
 
-            return result.raw
+            return report
 
         except Exception as e:
             error_msg = str(e).lower()
@@ -269,7 +697,7 @@ def run_research(query: str):
             # Check for rate limiting or overload errors
             if "overloaded" in error_msg or "rate limit" in error_msg or "quota" in error_msg:
                 if attempt < max_retries - 1:
-                    print(f"Rate limit encountered, waiting {retry_delay * (attempt + 1)} seconds...")
+                    logger.warning(f"Rate limit encountered, waiting {retry_delay * (attempt + 1)} seconds...")
                     time.sleep(retry_delay * (attempt + 1))
                     continue
                 else:
@@ -277,7 +705,7 @@ def run_research(query: str):
 
             # Handle other errors
             if attempt < max_retries - 1:
-                print(f"Error on attempt {attempt + 1}, retrying in {retry_delay} seconds...")
+                logger.warning(f"Error on attempt {attempt + 1}, retrying in {retry_delay} seconds: {e}")
                 time.sleep(retry_delay)
                 continue
             else:
@@ -1,16 +1,16 @@
 import streamlit as st
-from agents import run_research
+from agents import run_research, get_log_tail, ResearchLog, TOTAL_TASKS
 import os
 from datetime import datetime
-import base64
 from io import BytesIO
-import markdown
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+from collections import namedtuple
+import functools
 import re
 import time
+import html as html_lib
+from html.parser import HTMLParser
+import queue
+import threading
 
 st.set_page_config(
     page_title="🔍 Agentic Deep Researcher",
@@ -24,82 +24,297 @@ if "gemini_api_key" not in st.session_state:
     st.session_state.gemini_api_key = ""
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "research_log" not in st.session_state:
+    st.session_state.research_log = ResearchLog()  # This browser session's research output only
 
 
 def reset_chat():
     st.session_state.messages = []
 
 
-def estimate_word_count(content):
-    clean_content = re.sub(r'[*#`]', '', content)
-    clean_content = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', clean_content)
-    words = clean_content.split()
-    return len(words)
+# Markdown emphasis/heading characters and [text](url) links, matched in a single pass
+_MD_STRIP = re.compile(r'[*#`]')
+_MD_CLEAN = re.compile(r'[*#`]|\[([^\]]+)\]\([^)]+\)')
 
 
-def create_download_link(content, filename, file_format="txt"):
-    if file_format == "txt":
-        clean_content = re.sub(r'[*#`]', '', content)
-        clean_content = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', clean_content)
-        b64 = base64.b64encode(clean_content.encode()).decode()
-        href = f'<a href="data:text/plain;base64,{b64}" download="{filename}.txt">📄 Download as Text</a>'
-    elif file_format == "md":
-        b64 = base64.b64encode(content.encode()).decode()
-        href = f'<a href="data:text/markdown;base64,{b64}" download="{filename}.md">📝 Download as Markdown</a>'
-    return href
+def _clean_match(match):
+    link_text = match.group(1)
+    return _MD_STRIP.sub('', link_text) if link_text else ''
 
 
-def create_pdf_report(content, query):
+def clean_markdown(content):
+    return _MD_CLEAN.sub(_clean_match, content)
+
+
+ReportStats = namedtuple("ReportStats", ["cleaned", "word_count", "char_count"])
+
+
+# Cached as a plain tuple - st.cache_data pickles return values, and a class defined in
+# the Streamlit script module can't be unpickled by reference
+@st.cache_data(max_entries=64, show_spinner=False)
+def _compute_report_stats(content):
+    cleaned = clean_markdown(content)
+    return cleaned, len(cleaned.split()), len(content)
+
+
+def _report_stats(content):
+    """Clean the report and count its words and characters in one pass over the content"""
+    return ReportStats(*_compute_report_stats(content))
+
+
+def estimate_word_count(content):
+    return _report_stats(content).word_count
+
+
+# Block-level elements of the markdown HTML, each rendered as a single Paragraph
+_BLOCK_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'pre', 'dt', 'dd', 'th', 'td'}
+_BLOCK_STYLES = {
+    'h1': 'CustomHeading', 'h2': 'BlockHeading3', 'h3': 'BlockHeading4', 'h4': 'BlockHeading4',
+    'h5': 'BlockHeading4', 'h6': 'BlockHeading4', 'p': 'BlockBody', 'th': 'BlockBody', 'td': 'BlockBody',
+    'dt': 'BlockBody', 'dd': 'BlockBullet', 'li': 'BlockBullet', 'pre': 'BlockCode',
+}
+# Inline tags ReportLab's Paragraph markup understands; they are re-emitted without attributes
+_INLINE_TAGS = {'b', 'i', 'u', 'strong', 'em', 'sup', 'sub', 'strike'}
+
+
+class _PdfBlockParser(HTMLParser):
+    """Split markdown HTML into (style key, ReportLab markup, bullet, list depth) blocks.
+
+    Inline markup is rebuilt from scratch, so only tags and attributes ReportLab
+    accepts reach it; anything else is dropped but its text is kept.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._buffer = []
+        self._block = None
+        self._bullet = None
+        self._lists = []
+        self._links = []
+        self._skip = 0
+
+    def _flush(self):
+        text = ''.join(self._buffer).strip()
+        self._buffer = []
+        if text:
+            block = self._block or 'p'
+            if block == 'dt':
+                text = f'<b>{text}</b>'
+            self.blocks.append((block, text, self._bullet, len(self._lists)))
+            self._bullet = None  # Further text of the same item continues without a bullet
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        elif tag in ('ul', 'ol'):
+            self._flush()
+            self._lists.append([tag, 0])
+        elif tag == 'li':
+            self._flush()
+            current = self._lists[-1] if self._lists else ['ul', 0]
+            current[1] += 1
+            self._bullet = f'{current[1]}.' if current[0] == 'ol' else '\u2022'
+            self._block = 'li'
+        elif tag == 'p' and self._block in ('li', 'dd', 'th', 'td'):
+            self._buffer.append(' ')  # Loose list items wrap their text in <p>
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+            self._block = tag
+        elif tag == 'br':
+            self._buffer.append('<br/>')
+        elif tag == 'a':
+            href = dict(attrs).get('href') or ''
+            # In-document anchors (footnotes) have no destination in the PDF
+            linked = bool(href) and not href.startswith('#')
+            self._links.append(linked)
+            if linked:
+                self._buffer.append(f'<a href="{html_lib.escape(href)}">')
+        elif tag in _INLINE_TAGS:
+            self._buffer.append(f'<{tag}>')
+        elif tag == 'code':
+            self._buffer.append('<font face="Courier">')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in ('ul', 'ol'):
+            self._flush()
+            if self._lists:
+                self._lists.pop()
+            self._block = 'li' if self._lists else None
+        elif tag == 'li':
+            self._flush()
+            self._block = None
+        elif tag == 'p' and self._block in ('li', 'dd', 'th', 'td'):
+            self._buffer.append(' ')
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+            self._block = None
+        elif tag == 'a':
+            if self._links and self._links.pop():
+                self._buffer.append('</a>')
+        elif tag in _INLINE_TAGS:
+            self._buffer.append(f'</{tag}>')
+        elif tag == 'code':
+            self._buffer.append('</font>')
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        text = html_lib.escape(data, quote=False)
+        if self._block == 'pre':
+            text = text.replace('\n', '<br/>')
+        self._buffer.append(text)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+_PDF_CSS = """
+@page { size: letter; margin: 1in 1in 0.25in 1in; }
+body { font-family: Helvetica, Arial, sans-serif; font-size: 10pt; line-height: 1.4; }
+h1.report-title { font-size: 18pt; color: #0066cc; margin-bottom: 30pt; }
+h2.report-heading, .report-body h1 { font-size: 14pt; color: #0066cc; }
+pre, code { font-family: Courier, monospace; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 4pt; }
+"""
+
+
+# markdown, ReportLab and WeasyPrint are imported inside the PDF helpers, so
+# script reruns that never build a PDF don't pay for loading them
+@functools.lru_cache(maxsize=1)
+def _get_weasyprint():
+    """Return the weasyprint module, or None if it or its native libraries (Pango/Cairo) are missing"""
     try:
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=30,
-                                     textColor='#0066cc')
-        heading_style = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=14, spaceAfter=12,
-                                       textColor='#0066cc')
-
-        story = [
-            Paragraph("Agentic Deep Research Report", title_style),
-            Spacer(1, 12),
-            Paragraph(f"<b>Research Query:</b> {query}", styles['Normal']),
-            Spacer(1, 12),
-            Paragraph(f"<b>Generated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']),
-            Paragraph(f"<b>Word Count:</b> {estimate_word_count(content)} words", styles['Normal']),
-            Spacer(1, 20),
-            Paragraph("Research Results:", heading_style),
-            Spacer(1, 12)
-        ]
-
-        for line in content.split('\n'):
-            if line.strip():
-                if line.startswith('# '):
-                    story.append(Paragraph(line[2:], heading_style))
-                    story.append(Spacer(1, 12))
-                elif line.startswith('## '):
-                    story.append(Paragraph(line[3:], styles['Heading3']))
-                    story.append(Spacer(1, 8))
-                elif line.startswith('### '):
-                    story.append(Paragraph(line[4:], styles['Heading4']))
-                    story.append(Spacer(1, 6))
-                else:
-                    clean_line = re.sub(r'[*#`]', '', line)
-                    clean_line = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', clean_line)
-                    story.append(Paragraph(clean_line.strip(), styles['Normal']))
-                    story.append(Spacer(1, 8))
-
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
-    except Exception as e:
-        st.error(f"❌ PDF generation failed: {e}")
-        return BytesIO(b"PDF generation failed. Please try again.")
-
-
-def display_download_options(content, query):
+        import weasyprint
+    except (ImportError, OSError):
+        return None
+    return weasyprint
+
+
+def _markdown_to_html(content):
+    """Convert the report to HTML, escaping any raw HTML in it instead of passing it through"""
+    import markdown
+
+    # The report is LLM output shaped by web content, so its HTML is treated as text
+    md = markdown.Markdown(extensions=['extra'])
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    return md.convert(content)
+
+
+def _refuse_url_fetch(url, *args, **kwargs):
+    """WeasyPrint URL fetcher that loads nothing, so reports can't pull in remote or local files"""
+    raise ValueError(f"External resources are disabled in PDF reports: {url}")
+
+
+def _render_pdf_weasyprint(weasyprint, content, query):
+    body = _markdown_to_html(content)
+    document = f"""
+    <html><head><style>{_PDF_CSS}</style></head><body>
+    <h1 class="report-title">Agentic Deep Research Report</h1>
+    <p><b>Research Query:</b> {html_lib.escape(query)}</p>
+    <p><b>Generated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}<br>
+    <b>Word Count:</b> {estimate_word_count(content)} words</p>
+    <h2 class="report-heading">Research Results:</h2>
+    <div class="report-body">{body}</div>
+    </body></html>
+    """
+    buffer = BytesIO()
+    weasyprint.HTML(string=document, url_fetcher=_refuse_url_fetch).write_pdf(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+# Report header as (text template, style name, space after) rows
+_PDF_HEADER = [
+    ("Agentic Deep Research Report", 'CustomTitle', 12),
+    ("<b>Research Query:</b> {query}", 'Normal', 12),
+    ("<b>Generated:</b> {generated}", 'Normal', 0),
+    ("<b>Word Count:</b> {word_count} words", 'Normal', 20),
+    ("Research Results:", 'CustomHeading', 12),
+]
+
+
+@functools.lru_cache(maxsize=1)
+def _get_pdf_styles():
+    """Build the ReportLab stylesheet, with the report's custom styles, once per process"""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    # One flowable per markdown block; spacing lives in the styles instead of extra Spacers
+    styles.add(ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=30,
+                              textColor='#0066cc'))
+    styles.add(ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=14, spaceAfter=12,
+                              textColor='#0066cc'))
+    styles.add(ParagraphStyle('BlockHeading3', parent=styles['Heading3'], spaceAfter=8))
+    styles.add(ParagraphStyle('BlockHeading4', parent=styles['Heading4'], spaceAfter=6))
+    styles.add(ParagraphStyle('BlockBody', parent=styles['Normal'], spaceAfter=8))
+    styles.add(ParagraphStyle('BlockBullet', parent=styles['Normal'], spaceAfter=4, leftIndent=18, bulletIndent=6))
+    styles.add(ParagraphStyle('BlockCode', parent=styles['Code'], spaceAfter=8))
+    return styles
+
+
+def _render_pdf_platypus(content, query):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    styles = _get_pdf_styles()
+
+    header_fields = {
+        'query': html_lib.escape(query),
+        'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'word_count': estimate_word_count(content),
+    }
+    story = []
+    for template, style_name, space_after in _PDF_HEADER:
+        story.append(Paragraph(template.format(**header_fields), styles[style_name]))
+        if space_after:
+            story.append(Spacer(1, space_after))
+
+    parser = _PdfBlockParser()
+    parser.feed(_markdown_to_html(content))
+    parser.close()
+
+    indented_styles = {}
+    for block, text, bullet, depth in parser.blocks:
+        style = styles[_BLOCK_STYLES[block]]
+        if depth > 1 and block in ('li', 'dd'):
+            # Nested list items step further in per level
+            if depth not in indented_styles:
+                indented_styles[depth] = ParagraphStyle(f'BlockBullet{depth}', parent=style,
+                                                        leftIndent=18 * depth, bulletIndent=18 * depth - 12)
+            style = indented_styles[depth]
+        story.append(Paragraph(text, style, bulletText=bullet))
+
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+def create_pdf_report(content, query):
+    weasyprint = _get_weasyprint()
+    if weasyprint is not None:
+        return _render_pdf_weasyprint(weasyprint, content, query)
+    return _render_pdf_platypus(content, query)
+
+
+# Render errors propagate out of here - st.cache_data doesn't cache exceptions, so a failed
+# build is retried on the next rerun instead of being served from the cache
+@st.cache_data(max_entries=64, show_spinner=False)
+def _build_pdf_bytes(content, query):
+    return create_pdf_report(content, query).getvalue()
+
+
+def display_download_options(content, query, stats):
     st.markdown("---")
-    word_count = estimate_word_count(content)
-    char_count = len(content)
+    word_count, char_count = stats.word_count, stats.char_count
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("📊 Word Count", f"{word_count:,}")
@@ -114,21 +329,96 @@ def display_download_options(content, query):
     filename = f"research_report_{timestamp}"
 
     with col1:
-        st.markdown(create_download_link(content, filename, "txt"), unsafe_allow_html=True)
+        st.download_button(
+            label="📄 Download as Text",
+            data=stats.cleaned.encode(),
+            file_name=f"{filename}.txt",
+            mime="text/plain",
+            on_click="ignore"
+        )
     with col2:
-        st.markdown(create_download_link(content, filename, "md"), unsafe_allow_html=True)
+        st.download_button(
+            label="📝 Download as Markdown",
+            data=content.encode(),
+            file_name=f"{filename}.md",
+            mime="text/markdown",
+            on_click="ignore"
+        )
     with col3:
-        pdf_buffer = create_pdf_report(content, query)
-        pdf_data = pdf_buffer.getvalue()
-        if pdf_data:
+        try:
+            pdf_data = _build_pdf_bytes(content, query)
+        except Exception as e:
+            st.error(f"❌ PDF generation failed: {e}. Please try again.")
+        else:
             st.download_button(
                 label="📄 Download as PDF",
                 data=pdf_data,
                 file_name=f"{filename}.pdf",
-                mime="application/pdf"
+                mime="application/pdf",
+                on_click="ignore"
             )
-        else:
-            st.error("❌ Failed to generate PDF. Please try again.")
+
+
+def _describe_step(step):
+    tool = getattr(step, "tool", None)
+    if tool:
+        return f"🌐 {tool}: {str(getattr(step, 'tool_input', ''))[:120]}"
+    return "🤔 Agents are reasoning..."
+
+
+def _run_research_with_progress(prompt, progress_bar, status_text, live_output, research_log):
+    """Run research in a worker thread, streaming CrewAI step/task events into the UI"""
+    events = queue.Queue()
+    outcome = {}
+
+    def worker():
+        try:
+            outcome["response"] = run_research(
+                prompt,
+                step_callback=lambda step: events.put(("step", step)),
+                task_callback=lambda output: events.put(("task", output)),
+                research_log=research_log,
+                attempt_callback=lambda attempt: events.put(("attempt", attempt)),
+            )
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(("done", None))
+
+    # Only the main script thread may touch Streamlit elements; the worker just enqueues events
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    completed = 0
+    accumulated = ""
+    while True:
+        kind, payload = events.get()
+        if kind == "done":
+            break
+        if kind == "attempt":
+            # run_research retried with a fresh set of crews, so progress starts over
+            completed = 0
+            accumulated = ""
+            progress_bar.progress(0)
+            live_output.empty()
+            if payload > 1:
+                status_text.text(f"🔁 Retrying research (attempt {payload})...")
+        elif kind == "step":
+            status_text.text(_describe_step(payload))
+        elif kind == "task":
+            completed += 1
+            progress_bar.progress(min(95, int(completed / TOTAL_TASKS * 100)))
+            if completed < TOTAL_TASKS - 1:
+                status_text.text(f"🌐 Web searches completed: {completed}/{TOTAL_TASKS - 1}")
+            elif completed == TOTAL_TASKS - 1:
+                status_text.text("📝 Analyzing and writing report...")
+            accumulated += f"\n\n---\n\n{payload.raw}"
+            live_output.markdown(accumulated)
+
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["response"]
 
 
 # Updated CSS with better content rendering
@@ -201,6 +491,10 @@ with st.sidebar:
     - Reports target 1500-2000 words
     """)
 
+    st.markdown("---")
+    if st.checkbox("Show research logs"):
+        st.code(get_log_tail(st.session_state.research_log) or "No log output yet.", language=None)
+
 col1, col2 = st.columns([6, 1])
 with col1:
     st.markdown("<h2 style='color: #0066cc;'>🔍 Agentic Deep Researcher</h2>", unsafe_allow_html=True)
@@ -243,20 +537,12 @@ if prompt := st.chat_input("Ask a research question for a comprehensive 2-3 page
         with st.spinner("🔍 Conducting comprehensive research... This may take 2-5 minutes for a detailed report..."):
             progress_bar = st.progress(0)
             status_text = st.empty()
+            live_output = st.empty()
 
             try:
                 status_text.text("🔍 Initializing research system...")
-                progress_bar.progress(20)
-
-                status_text.text("🌐 Conducting web searches...")
-                progress_bar.progress(40)
-
-                result = run_research(prompt)
-
-                status_text.text("📝 Analyzing and writing report...")
-                progress_bar.progress(80)
-
-                response = result
+                response = _run_research_with_progress(prompt, progress_bar, status_text, live_output,
+                                                       st.session_state.research_log)
 
                 status_text.text("✅ Research complete!")
                 progress_bar.progress(100)
@@ -264,16 +550,20 @@ if prompt := st.chat_input("Ask a research question for a comprehensive 2-3 page
                 time.sleep(1)
                 progress_bar.empty()
                 status_text.empty()
+                live_output.empty()
 
             except Exception as e:
                 progress_bar.empty()
                 status_text.empty()
+                live_output.empty()
                 response = f"❌ An error occurred during research: {str(e)}"
 
+    stats = _report_stats(response)
+
     # Fixed assistant response display
     with st.chat_message("assistant"):
-        if len(response) > 1000:
-            word_count = estimate_word_count(response)
+        if stats.char_count > 1000:
+            word_count = stats.word_count
             if word_count >= 1000:
                 st.markdown(
                     f'<div class="status-indicator status-success">✅ Comprehensive report generated: {word_count:,} words</div>',
@@ -291,5 +581,5 @@ if prompt := st.chat_input("Ask a research question for a comprehensive 2-3 page
 
     st.session_state.messages.append({"role": "assistant", "content": response})
 
-    if (response and not response.startswith("⚠️") and not response.startswith("❌") and len(response) > 500):
-        display_download_options(response, prompt)
\ No newline at end of file
+    if (response and not response.startswith("⚠️") and not response.startswith("❌") and stats.char_count > 500):
+        display_download_options(response, prompt, stats)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import importlib.util
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# The embedding / vector search stack is an optional extra and slow to import (torch), so
+# only check that it is installed here; the modules are imported on first use
+SEMANTIC_CACHE_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("faiss", "numpy", "sentence_transformers")
+)
+
+
+class CacheHit(NamedTuple):
+    """A cached report whose query was similar enough to the incoming one."""
+    query: str
+    report: str
+    similarity: float
+
+
+class CacheEntry(NamedTuple):
+    query: str
+    report: str
+    timestamp: float
+    embedding: "np.ndarray"
+
+
+class SemanticCache:
+    """Cache research reports keyed by the embedding of the query that produced them.
+
+    Lookups embed the incoming query and search a FAISS inner-product index of
+    normalized vectors, so the score is the cosine similarity. Entries are kept
+    in LRU order and evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", max_entries: int = 500,
+                 path: Optional[str] = None):
+        if not SEMANTIC_CACHE_AVAILABLE:
+            raise ImportError("Semantic cache is not available. Please install sentence-transformers and faiss-cpu")
+
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.path = path if path is not None else os.getenv("SEMANTIC_CACHE_PATH", ".semantic_cache.pkl")
+
+        self._lock = threading.Lock()
+        self._model = None  # Loaded on first use, the encoder is slow to initialize
+        self._index = None
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._next_id = 0
+        self._loaded = False  # The saved entries are read on first use, which imports numpy/faiss
+
+    def _get_model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _embed(self, text: str) -> "np.ndarray":
+        import numpy as np
+
+        vector = self._get_model().encode([text], normalize_embeddings=True)
+        return np.asarray(vector, dtype="float32")
+
+    def _new_index(self, dim: int):
+        import faiss
+
+        return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+
+    def _add_to_index(self, entry_id: int, embedding: "np.ndarray"):
+        import numpy as np
+
+        if self._index is None:
+            self._index = self._new_index(embedding.shape[1])
+        self._index.add_with_ids(embedding, np.array([entry_id], dtype="int64"))
+
+    def _remove(self, entry_id: int):
+        import numpy as np
+
+        self._entries.pop(entry_id, None)
+        if self._index is not None:
+            self._index.remove_ids(np.array([entry_id], dtype="int64"))
+
+    def _remove_expired(self, ttl: Optional[float]) -> bool:
+        """Drop entries older than ttl seconds, returning whether any were dropped"""
+        if ttl is None:
+            return False
+        cutoff = time.time() - ttl
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.timestamp < cutoff]
+        for entry_id in expired:
+            self._remove(entry_id)
+        return bool(expired)
+
+    def lookup(self, query: str, threshold: float = 0.92, ttl: Optional[float] = 24 * 3600) -> Optional[CacheHit]:
+        """Return the cached report for the most similar fresh query, or None on a miss"""
+        with self._lock:
+            self._ensure_loaded()
+            # Expired entries go first, so they can neither shadow a fresh match nor hold LRU slots
+            changed = self._remove_expired(ttl)
+            hit = None
+            if self._entries:
+                embedding = self._embed(query)
+                scores, ids = self._index.search(embedding, 1)
+                score, entry_id = float(scores[0][0]), int(ids[0][0])
+                if entry_id != -1 and score >= threshold:
+                    entry = self._entries[entry_id]
+                    self._entries.move_to_end(entry_id)
+                    hit = CacheHit(query=entry.query, report=entry.report, similarity=score)
+                    changed = True
+
+            # Saved on hits too, so the LRU order survives a restart
+            if changed:
+                self._save()
+            return hit
+
+    def insert(self, query: str, report: str, ttl: Optional[float] = 24 * 3600):
+        """Store a report under the embedding of its query, evicting expired and then least recently used entries"""
+        with self._lock:
+            self._ensure_loaded()
+            self._remove_expired(ttl)
+            embedding = self._embed(query)
+            entry_id = self._next_id
+            self._next_id += 1
+
+            self._entries[entry_id] = CacheEntry(query, report, time.time(), embedding)
+            self._add_to_index(entry_id, embedding)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+
+            self._save()
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._loaded = True
+            self._entries.clear()
+            self._index = None
+            self._save()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load semantic cache from {self.path}: {e}")
+            return
+
+        for entry_id, entry in entries.items():
+            self._entries[entry_id] = entry
+            self._add_to_index(entry_id, entry.embedding)
+        self._next_id = max(self._entries, default=-1) + 1
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "wb") as f:
+                pickle.dump(self._entries, f)
+        except Exception as e:
+            logger.warning(f"Could not save semantic cache to {self.path}: {e}")
@@ -0,0 +1,44 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket that only blocks callers once the budget is exhausted.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``, so short
+    bursts go through immediately and sustained load is held to ``rate``.
+    """
+
+    def __init__(self, rate: float = 2.0, capacity: int = 5):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Take tokens from the bucket, waiting only as long as needed for them to refill"""
+        with self._condition:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                self._condition.wait((tokens - self._tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, max_delay: float = 30.0) -> float:
+    """Exponential backoff with jitter for the given zero-based retry attempt"""
+    return min(2 ** attempt, max_delay) + random.uniform(0, 1)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an exception looks like an HTTP 429 / rate limit response"""
+    error_msg = str(error).lower()
+    return "429" in error_msg or "rate limit" in error_msg or "too many requests" in error_msg